@@ -0,0 +1,9 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'env_helper.settings')
+
+app = Celery('env_helper')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
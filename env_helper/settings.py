@@ -97,6 +97,12 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Celery
+# Docker work (container start/stop, volume cleanup) runs in a worker so web
+# workers aren't pinned by image pulls or slow container stops
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
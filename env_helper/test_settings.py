@@ -1,12 +1,37 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
 from .settings import *
 
+# A shared-cache in-memory URI (rather than the plain ':memory:' name) lets
+# every connection in the process see the same database, so the test client
+# never hits a fresh empty schema from a second connection. The test database
+# itself is left to the SQLite backend, which builds the equivalent
+# file:memorydb_<alias>?mode=memory&cache=shared URI per (xdist) worker.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': ':memory:',
+        'NAME': 'file::memory:?cache=shared',
+        'OPTIONS': {'uri': True},
     }
 }
 
+
+@receiver(connection_created)
+def _tune_sqlite_for_tests(sender, connection, **kwargs):
+    """Relax durability on every test connection — the DB is throwaway."""
+    if connection.vendor == 'sqlite':
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA synchronous=OFF;')
+        cursor.execute('PRAGMA journal_mode=MEMORY;')
+        cursor.execute('PRAGMA temp_store=MEMORY;')
+
+
+# Run Celery tasks inline so tests see the Docker calls and row updates
+# synchronously; propagate so task errors surface as view error responses
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+
 # Use a faster password hasher for tests
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
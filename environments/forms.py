@@ -1,10 +1,52 @@
 from django import forms
 from django.core.exceptions import ValidationError
 import json
+import logging
 
-from .models import Environment
+from .models import Environment, validate_container_name
+
+logger = logging.getLogger(__name__)
 
 class EnvironmentForm(forms.ModelForm):
+    # Fields are declared explicitly so each form instantiation copies these
+    # definitions instead of re-running fields_for_model() introspection on
+    # every request; they mirror the model columns in Meta.fields.
+    name = forms.CharField(
+        max_length=100,
+        validators=[validate_container_name],
+        help_text='Name can only contain letters, numbers, underscores, periods, and hyphens.'
+    )
+    description = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}))
+    environment_type = forms.ChoiceField(choices=Environment.ENVIRONMENT_TYPES)
+    image = forms.CharField(max_length=255)
+    ports = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={'placeholder': '8080:80, 3000:3000'})
+    )
+    volumes = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={
+            'rows': 3,
+            'placeholder': '/host/path:/container/path\n/data:/app/data'
+        })
+    )
+    env_vars = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={
+            'rows': 3,
+            'placeholder': 'KEY1=value1\nKEY2=value2'
+        })
+    )
+    cpu_limit = forms.CharField(
+        max_length=10, required=False,
+        widget=forms.TextInput(attrs={'placeholder': '1.0'})
+    )
+    memory_limit = forms.CharField(
+        max_length=10, required=False,
+        widget=forms.TextInput(attrs={'placeholder': '2g'})
+    )
+    auto_start = forms.BooleanField(required=False)
+
     class Meta:
         model = Environment
         fields = [
@@ -12,37 +54,19 @@ class EnvironmentForm(forms.ModelForm):
             'ports', 'volumes', 'env_vars', 'cpu_limit',
             'memory_limit', 'auto_start'
         ]
-        widgets = {
-            'description': forms.Textarea(attrs={'rows': 3}),
-            'volumes': forms.Textarea(attrs={
-                'rows': 3,
-                'placeholder': '/host/path:/container/path\n/data:/app/data'
-            }),
-            'env_vars': forms.Textarea(attrs={
-                'rows': 3,
-                'placeholder': 'KEY1=value1\nKEY2=value2'
-            }),
-            'ports': forms.TextInput(attrs={
-                'placeholder': '8080:80, 3000:3000'
-            }),
-            'cpu_limit': forms.TextInput(attrs={
-                'placeholder': '1.0'
-            }),
-            'memory_limit': forms.TextInput(attrs={
-                'placeholder': '2g'
-            })
-        }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
-        # Debug logging
         if self.instance and self.instance.pk:
-            print(f"Editing environment {self.instance.pk}")
-            print(f"Ports: {self.instance.ports}")
-            print(f"Env vars (raw): {self.instance.env_vars}")
-            print(f"Volumes (raw): {self.instance.volumes}")
-            
+            # Lazy %-style logging so the interpolation is skipped when DEBUG is off
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Editing environment %s", self.instance.pk)
+                logger.debug("Ports: %s", self.instance.ports)
+                logger.debug("Env vars (raw): %s", self.instance.env_vars)
+                logger.debug("Volumes (raw): %s", self.instance.volumes)
+
+
             # Convert env_vars to text format for initial display
             if self.instance.env_vars:
                 try:
@@ -54,10 +78,11 @@ class EnvironmentForm(forms.ModelForm):
                     
                     # Convert to KEY=value format
                     env_vars_text = '\n'.join(f"{key}={value}" for key, value in env_dict.items())
-                    print(f"Env vars (converted): {env_vars_text}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Env vars (converted): %s", env_vars_text)
                     self.initial['env_vars'] = env_vars_text
                 except (json.JSONDecodeError, AttributeError) as e:
-                    print(f"Error converting env vars: {e}")
+                    logger.warning("Error converting env vars: %s", e)
                     if isinstance(self.instance.env_vars, dict):
                         self.initial['env_vars'] = '\n'.join(f"{key}={value}" for key, value in self.instance.env_vars.items())
                     else:
@@ -74,32 +99,44 @@ class EnvironmentForm(forms.ModelForm):
                         self.initial['volumes'] = '\n'.join(f"{name}:{path}" for name, path in self.instance.volumes.items())
                     else:
                         self.initial['volumes'] = str(self.instance.volumes)
-                    print(f"Volumes (converted): {self.initial['volumes']}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Volumes (converted): %s", self.initial['volumes'])
                 except Exception as e:
-                    print(f"Error converting volumes: {e}")
+                    logger.warning("Error converting volumes: %s", e)
                     self.initial['volumes'] = str(self.instance.volumes)
-            
-            print(f"Volumes: {self.instance.volumes}")
-            
+
+
         # If this is a new environment and environment_type is set
         if not self.instance.pk and hasattr(self, 'data') and 'environment_type' in self.data:
-            env_type = self.data['environment_type']
-            if env_type in Environment.DEFAULT_CONFIGS:
-                # Make a mutable copy of the data
-                self.data = self.data.copy()
-                # Only set defaults for empty fields
-                config = Environment.DEFAULT_CONFIGS[env_type]
-                for field, value in config.items():
-                    if not self.data.get(field):
-                        self.data[field] = value
+            config = Environment.DEFAULT_CONFIGS.get(self.data['environment_type'])
+            if config:
+                # Only set defaults for empty fields; QueryDict.copy() deep-copies
+                # every value list, so skip it entirely when nothing is missing
+                missing = [field for field in config if not self.data.get(field)]
+                if missing:
+                    self.data = self.data.copy()
+                    for field in missing:
+                        self.data[field] = config[field]
 
     def clean_env_vars(self):
-        """Convert environment variables from text format to dict."""
+        """Validate environment variables in KEY=value text format."""
         data = self.cleaned_data['env_vars']
         if not data:
             return ''
 
-        # Keep the raw text format
+        # Single linear scan; partition() splits and checks for '=' in one call.
+        # Blank lines and comments are allowed, everything else must be KEY=value.
+        for line in data.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            key, sep, _ = stripped.partition('=')
+            if not sep or not key.strip():
+                raise ValidationError(
+                    f'Environment variables must be in KEY=value format (got {stripped!r})'
+                )
+
+        # Keep the raw text format; the model parses it to JSON on save
         return data
 
     def clean_ports(self):
@@ -108,18 +145,19 @@ class EnvironmentForm(forms.ModelForm):
         if not data:
             return ''
         
-        # Split by comma and validate each port mapping
-        port_mappings = [p.strip() for p in data.split(',')]
-        for mapping in port_mappings:
-            if ':' not in mapping:
+        # Single pass over the comma-separated mappings; partition() gives both
+        # halves and the separator check in one call
+        for mapping in data.split(','):
+            host_port, sep, container_port = mapping.strip().partition(':')
+            if not sep:
                 raise ValidationError('Port mapping must be in format host_port:container_port')
-            host_port, container_port = mapping.split(':')
             try:
-                if not (1 <= int(host_port) <= 65535 and 1 <= int(container_port) <= 65535):
-                    raise ValidationError('Ports must be between 1 and 65535')
+                host, container = int(host_port), int(container_port)
             except ValueError:
                 raise ValidationError('Ports must be valid numbers')
-        
+            if not (0 < host < 65536 and 0 < container < 65536):
+                raise ValidationError('Ports must be between 1 and 65535')
+
         return data
 
     def clean_volumes(self):
@@ -127,9 +165,13 @@ class EnvironmentForm(forms.ModelForm):
         data = self.cleaned_data['volumes']
         if not data:
             return ''
-        
-        for line in data.strip().split('\n'):
-            if ':' not in line:
-                raise ValidationError('Volume mount must be in format host_path:container_path')
-        
+
+        # splitlines() handles \r\n and avoids the intermediate strip();
+        # short-circuit on the first malformed line
+        bad = next((line for line in data.splitlines() if line.strip() and ':' not in line), None)
+        if bad is not None:
+            raise ValidationError(
+                f'Volume mount must be in format host_path:container_path (got {bad.strip()!r})'
+            )
+
         return data
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-09-01 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('environments', '0006_alter_environment_environment_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='environment',
+            index=models.Index(fields=['created_by', '-created_at'], name='environment_created_676a65_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='environment',
+            index=models.Index(fields=['is_running'], name='environment_is_runn_9c4967_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-09-01 02:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_ports(apps, schema_editor):
+    """Parse each environment's serialized ports string into port rows."""
+    Environment = apps.get_model('environments', 'Environment')
+    EnvironmentPort = apps.get_model('environments', 'EnvironmentPort')
+    bindings = []
+    for environment in Environment.objects.exclude(ports='').iterator():
+        for mapping in environment.ports.split(','):
+            host_port, _, container_port = mapping.strip().partition(':')
+            try:
+                bindings.append(EnvironmentPort(
+                    environment=environment,
+                    host_port=int(host_port),
+                    container_port=int(container_port),
+                ))
+            except ValueError:
+                continue
+    EnvironmentPort.objects.bulk_create(bindings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('environments', '0007_environment_environment_created_676a65_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvironmentPort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host_port', models.PositiveIntegerField(db_index=True)),
+                ('container_port', models.PositiveIntegerField()),
+                ('environment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='port_bindings', to='environments.environment')),
+            ],
+        ),
+        migrations.RunPython(backfill_ports, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,24 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from functools import cached_property
+from secrets import token_hex
+from types import MappingProxyType
 import re
 import json
 
+# Docker container names must match [a-zA-Z0-9][a-zA-Z0-9_.-]*; compiled once at
+# import time so validation/save paths skip the re cache lookup. \Z avoids the
+# trailing-newline edge case that $ would accept.
+_NAME_RE = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9_.-]*\Z')
+_UNSAFE_RE = re.compile(r'[^a-zA-Z0-9_.-]')
+
 def validate_container_name(value):
     """Validate that the name will result in a valid Docker container name."""
-    # Docker container names must match [a-zA-Z0-9][a-zA-Z0-9_.-]
-    if not re.match(r'^[a-zA-Z0-9][a-zA-Z0-9_.-]*$', value):
+    if not _NAME_RE.match(value):
         raise ValidationError(
             'Name can only contain letters, numbers, underscores, periods, and hyphens, '
             'and must start with a letter or number.'
@@ -16,15 +27,18 @@ def validate_container_name(value):
 # Create your models here.
 
 class Environment(models.Model):
-    ENVIRONMENT_TYPES = (
-        ('vscode', 'VSCode'),
-        ('webtop', 'Docker Webtop'),
-        ('custom', 'Custom Environment')
-    )
+    # A mapping (supported as choices since Django 5.0) so display names can be
+    # looked up in O(1) without scanning a tuple of pairs
+    ENVIRONMENT_TYPES = {
+        'vscode': 'VSCode',
+        'webtop': 'Docker Webtop',
+        'custom': 'Custom Environment',
+    }
 
-    # Default configurations for each environment type
+    # Default configurations for each environment type; read-only mappings so
+    # shared class state can't be mutated by accident
     DEFAULT_CONFIGS = {
-        'vscode': {
+        'vscode': MappingProxyType({
             'image': 'codercom/code-server:latest',
             'ports': '8443:8080',
             'env_vars': 'PASSWORD=password123\nTZ=UTC',
@@ -32,8 +46,8 @@ class Environment(models.Model):
             'cpu_limit': '1.0',
             'memory_limit': '2g',
             'auto_start': True
-        },
-        'webtop': {
+        }),
+        'webtop': MappingProxyType({
             'image': 'linuxserver/webtop:ubuntu-kde',
             'ports': '3000:3000',
             'env_vars': 'PUID=1000\nPGID=1000\nTZ=UTC',
@@ -41,8 +55,8 @@ class Environment(models.Model):
             'cpu_limit': '2.0',
             'memory_limit': '4g',
             'auto_start': True
-        },
-        'custom': {
+        }),
+        'custom': MappingProxyType({
             'image': '',
             'ports': '',
             'env_vars': 'TZ=UTC',
@@ -50,7 +64,7 @@ class Environment(models.Model):
             'cpu_limit': '1.0',
             'memory_limit': '2g',
             'auto_start': False
-        }
+        })
     }
 
     name = models.CharField(
@@ -82,49 +96,77 @@ class Environment(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ('name', 'created_by')  # Names must be unique per user
+        indexes = [
+            # Covers the per-user dashboard query with its -created_at ordering
+            models.Index(fields=['created_by', '-created_at']),
+            # Admin list_filter on running state
+            models.Index(fields=['is_running']),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.environment_type})"
 
+    @cached_property
+    def parsed_ports(self):
+        """Port mappings parsed once into ((host_port, container_port), ...) tuples."""
+        if not self.ports:
+            return ()
+        mappings = []
+        for mapping in self.ports.split(','):
+            host_port, _, container_port = mapping.strip().partition(':')
+            try:
+                mappings.append((int(host_port), int(container_port)))
+            except ValueError:
+                continue
+        return tuple(mappings)
+
     @property
     def ui_port(self):
         """Get the UI port (first host port) from the port mappings."""
-        if not self.ports:
-            return None
-        
-        # Get the first port mapping
-        port_mappings = [p.strip() for p in self.ports.split(',')]
-        if not port_mappings:
-            return None
-            
-        # Parse the first port mapping
-        first_mapping = port_mappings[0]
-        try:
-            host_port = first_mapping.split(':')[0]
-            return int(host_port)
-        except (IndexError, ValueError):
-            return None
+        return self.parsed_ports[0][0] if self.parsed_ports else None
 
-    @property
+    @cached_property
+    def parsed_env_vars(self):
+        """env_vars parsed once into a {KEY: value} dict.
+
+        Skips blank and comment lines; partition() splits each line in a
+        single pass. Memoized per instance, so container starts and repeated
+        template access within a request parse the text only once.
+        """
+        env_vars = {}
+        if self.env_vars:
+            for line in self.env_vars.splitlines():
+                stripped = line.strip()
+                if not stripped or stripped.startswith('#'):
+                    continue
+                key, sep, value = stripped.partition('=')
+                if sep:
+                    env_vars[key.strip()] = value.strip()
+        return env_vars
+
+    @cached_property
     def env_vars_as_text(self):
-        """Convert environment variables to text format."""
+        """Convert environment variables to text format (memoized per instance)."""
         if not self.env_vars:
             return ''
-        
-        try:
-            if isinstance(self.env_vars, str):
-                # Try to parse as JSON if it's a string
+
+        if isinstance(self.env_vars, str):
+            # The field stores KEY=value text; only legacy JSON blobs start
+            # with '{', so skip the json.loads attempt for everything else
+            if self.env_vars[:1] != '{':
+                return self.env_vars
+            try:
                 env_dict = json.loads(self.env_vars)
-            elif isinstance(self.env_vars, dict):
-                env_dict = self.env_vars
-            else:
-                return str(self.env_vars)
-            
-            # Convert to KEY=value format
-            return '\n'.join(f"{key}={value}" for key, value in env_dict.items())
-        except (json.JSONDecodeError, AttributeError):
+            except json.JSONDecodeError:
+                return self.env_vars
+        elif isinstance(self.env_vars, dict):
+            env_dict = self.env_vars
+        else:
             return str(self.env_vars)
 
+        # Convert to KEY=value format
+        return '\n'.join(f"{key}={value}" for key, value in env_dict.items())
+
     def clean(self):
         """Additional model validation."""
         super().clean()
@@ -140,29 +182,84 @@ class Environment(models.Model):
                 })
     
     def save(self, *args, **kwargs):
-        # Run full validation before saving
-        self.full_clean()
-        
-        # Generate a unique volume name if not set
+        update_fields = kwargs.get('update_fields')
+        # Drop memoized parse results in case ports/env_vars changed on this instance
+        self.__dict__.pop('parsed_ports', None)
+        self.__dict__.pop('parsed_env_vars', None)
+        self.__dict__.pop('env_vars_as_text', None)
+
+        # Run full validation before saving. Partial saves of runtime state
+        # (e.g. update_fields=['is_running', 'container_id']) skip it — the
+        # validated fields can't change, so re-running validators and the
+        # unique_together check (an extra SELECT) would be wasted work.
+        if update_fields is None or {'name', 'image', 'environment_type'} & set(update_fields):
+            self.full_clean()
+
+        # Generate a unique volume name if not set; token_hex(4) gives the same
+        # 8 random hex chars as uuid4().hex[:8] without formatting a full UUID
         if not self.volume_name:
-            import uuid
-            self.volume_name = f"env_helper_{self.environment_type}_{uuid.uuid4().hex[:8]}"
-        
+            self.volume_name = f"env_helper_{self.environment_type}_{token_hex(4)}"
+
         # Parse environment variables from text format to JSON
-        if self.env_vars:
+        if self.env_vars and (update_fields is None or 'env_vars' in update_fields):
             env_dict = {}
             for line in self.env_vars.split('\n'):
                 if '=' in line:
                     key, value = line.split('=', 1)
                     env_dict[key.strip()] = value.strip()
             self.environment_variables = env_dict
-        
+            # A partial save of env_vars must also write the recomputed JSON
+            # mirror, or the two columns silently diverge
+            if update_fields is not None and 'environment_variables' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'environment_variables']
+
         super().save(*args, **kwargs)
-    
+
+        # Keep the normalized port table in sync whenever ports may have changed
+        if update_fields is None or 'ports' in update_fields:
+            self.port_bindings.all().delete()
+            if self.parsed_ports:
+                EnvironmentPort.objects.bulk_create(
+                    EnvironmentPort(
+                        environment=self, host_port=host_port, container_port=container_port
+                    )
+                    for host_port, container_port in self.parsed_ports
+                )
+
     @property
     def container_name(self):
         """Generate a unique container name."""
         # Replace any invalid characters with underscores
-        safe_username = re.sub(r'[^a-zA-Z0-9_.-]', '_', self.created_by.username)
-        safe_name = re.sub(r'[^a-zA-Z0-9_.-]', '_', self.name)
+        safe_username = _UNSAFE_RE.sub('_', self.created_by.username)
+        safe_name = _UNSAFE_RE.sub('_', self.name)
         return f'env-{safe_username}-{safe_name}'
+
+
+class EnvironmentPort(models.Model):
+    """One row per host:container port mapping, kept in sync from `ports`.
+
+    Normalizing the serialized `ports` string lets port-availability checks
+    hit an index instead of a substring scan over every row (where "8080:"
+    would also match "18080:").
+    """
+
+    environment = models.ForeignKey(
+        Environment, on_delete=models.CASCADE, related_name='port_bindings'
+    )
+    host_port = models.PositiveIntegerField(db_index=True)
+    container_port = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.host_port}:{self.container_port}"
+
+
+@receiver(post_save, sender=Environment)
+@receiver(post_delete, sender=Environment)
+def _invalidate_port_availability(sender, instance, **kwargs):
+    """Drop cached port-availability answers for this environment's ports.
+
+    check_port_available caches its results briefly; a save or delete can flip
+    a port between taken and free, so its cache entries must not outlive it.
+    """
+    if instance.parsed_ports:
+        cache.delete_many([f'port-avail:{host}' for host, _ in instance.parsed_ports])
@@ -9,7 +9,7 @@ class EnvironmentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'environment_type',
             'created_by', 'created_at', 'updated_at',
-            'image', 'port', 'volume_path', 'environment_variables',
-            'is_running', 'container_id'
+            'image', 'ports', 'volumes', 'env_vars',
+            'environment_variables', 'is_running', 'container_id'
         ]
         read_only_fields = ['created_by', 'created_at', 'updated_at', 'is_running', 'container_id']
@@ -0,0 +1,218 @@
+import logging
+import threading
+
+import docker
+import requests.exceptions
+from celery import shared_task
+from docker.errors import APIError, ImageNotFound, NotFound
+
+from .models import Environment
+
+logger = logging.getLogger(__name__)
+
+# Shared Docker client. The client keeps an HTTP-over-UDS connection pool, so
+# building one per task pays socket setup and parser initialization on every
+# action; instead it is created lazily once and reused across tasks.
+_docker_client = None
+_docker_client_lock = threading.Lock()
+
+# docker-py's urllib3 pool defaults to 2 connections; the pool is widened to
+# match this cap so parallel operations each get a socket, and the semaphore
+# keeps file-descriptor usage on /var/run/docker.sock bounded
+_DOCKER_MAX_CONCURRENCY = 20
+_docker_sema = threading.BoundedSemaphore(_DOCKER_MAX_CONCURRENCY)
+
+def get_docker_client():
+    """Return the shared Docker client, connecting on first use."""
+    global _docker_client
+    if _docker_client is None:
+        with _docker_client_lock:
+            if _docker_client is None:
+                logger.info("Initializing Docker client with unix:///var/run/docker.sock")
+                client = docker.DockerClient(
+                    base_url='unix:///var/run/docker.sock',
+                    max_pool_size=_DOCKER_MAX_CONCURRENCY,
+                )
+                # One-shot diagnostic at first connect; probing version() on
+                # every action cost a daemon round-trip per request just to log
+                logger.info(
+                    "Connected to Docker daemon (API version %s)",
+                    client.version().get('ApiVersion'),
+                )
+                _docker_client = client
+    return _docker_client
+
+def reset_docker_client():
+    """Drop the shared client so the next call reconnects.
+
+    Called when a task dies on a connection error (e.g. the daemon was
+    restarted); the cached client's pooled sockets are no longer usable.
+    """
+    global _docker_client
+    with _docker_client_lock:
+        _docker_client = None
+
+
+@shared_task(autoretry_for=(APIError,), retry_backoff=True, max_retries=3)
+def start_environment(environment_id):
+    """Create and start the Docker container for an environment."""
+    environment = Environment.objects.get(pk=environment_id)
+    logger.info(f"Starting environment {environment.pk} ({environment.name})")
+
+    try:
+        # Cap concurrent daemon operations (and FD usage) at the pool size
+        with _docker_sema:
+            client = get_docker_client()
+
+            # Check if volume exists, create if not; list(filters=...) answers
+            # in one daemon round-trip instead of get() + NotFound + create()
+            volume_name = environment.volume_name
+            logger.info(f"Checking for volume {volume_name}")
+            if not client.volumes.list(filters={'name': volume_name}):
+                logger.info(f"Creating volume {volume_name}")
+                # The env_id label lets teardown and bulk cleanup remove volumes
+                # with one prune(filters=...) call instead of per-volume get+remove
+                client.volumes.create(
+                    name=volume_name,
+                    labels={
+                        'env-helper.env_id': str(environment.pk),
+                        'env-helper.owner': str(environment.created_by_id),
+                    },
+                )
+
+            container_name = environment.container_name
+
+            # Build port mappings from the normalized port table
+            port_mappings = {
+                f'{binding.container_port}/tcp': binding.host_port
+                for binding in environment.port_bindings.all()
+            }
+
+            # Get environment variables (parsed and memoized on the model)
+            env_vars = environment.parsed_env_vars
+
+            # Log container configuration
+            logger.debug(f"Container config: image={environment.image}, ports={port_mappings}, "
+                        f"volume={volume_name}, env_vars={env_vars}")
+
+            # Pull explicitly only when the image is missing; containers.run would
+            # inspect the image on every start and pull implicitly, leaving image
+            # download errors indistinguishable from container start errors
+            try:
+                client.images.get(environment.image)
+            except ImageNotFound:
+                logger.info(f"Pulling image {environment.image}")
+                client.images.pull(environment.image)
+
+            # create() + start(): two fast calls with no implicit pull on the hot path
+            container = client.containers.create(
+                environment.image,
+                name=container_name,
+                ports=port_mappings,
+                volumes={volume_name: {'bind': '/config', 'mode': 'rw'}},
+                environment=env_vars,
+                # The managed label lets list pages fetch every container we
+                # own in one filtered containers.list call; the owner label
+                # lets bulk teardown prune per user
+                labels={
+                    'env-helper.managed': 'true',
+                    'env-helper.owner': str(environment.created_by_id),
+                },
+                restart_policy={"Name": "unless-stopped"} if environment.auto_start else {"Name": "no"}
+            )
+            container.start()
+            logger.info(f"Container {container.id} started successfully")
+
+            environment.container_id = container.id
+            environment.is_running = True
+            # Only runtime state changed; skip rewriting the TEXT columns
+            environment.save(update_fields=['container_id', 'is_running'])
+            logger.info(f"Environment {environment.pk} updated with container ID {container.id}")
+    except requests.exceptions.ConnectionError:
+        reset_docker_client()
+        raise
+
+
+@shared_task(autoretry_for=(APIError,), retry_backoff=True, max_retries=3)
+def stop_environment(environment_id):
+    """Stop and remove the Docker container for an environment."""
+    environment = Environment.objects.get(pk=environment_id)
+    logger.info(f"Stopping environment {environment.pk} ({environment.name})")
+
+    try:
+        # Cap concurrent daemon operations (and FD usage) at the pool size
+        with _docker_sema:
+            client = get_docker_client()
+            container_id = environment.container_id
+            logger.info(f"Getting container {container_id}")
+
+            try:
+                # One get() for both calls — each lookup is a daemon round-trip
+                container = client.containers.get(container_id)
+            except NotFound:
+                # Removed out-of-band (manual docker rm, daemon restart):
+                # already stopped, so just bring the row in line. Caught here
+                # rather than autoretried — NotFound subclasses APIError, and
+                # retrying a lookup that can't succeed would leave the row
+                # stuck at is_running=True
+                logger.warning(f"Container {container_id} not found; treating as already stopped")
+            else:
+                container.stop()
+                logger.info(f"Container {container_id} stopped successfully")
+                container.remove()
+                logger.info(f"Container {container_id} removed successfully")
+
+            environment.container_id = None
+            environment.is_running = False
+            # Only runtime state changed; skip rewriting the TEXT columns
+            environment.save(update_fields=['container_id', 'is_running'])
+            logger.info(f"Environment {environment.pk} updated")
+    except requests.exceptions.ConnectionError:
+        reset_docker_client()
+        raise
+
+
+@shared_task(autoretry_for=(APIError,), retry_backoff=True, max_retries=3)
+def destroy_environment(container_id, volume_name, environment_id):
+    """Clean up the Docker container and volume left behind by a deleted environment.
+
+    Takes the Docker identifiers rather than looking them up: the database
+    row is deleted before this task runs.
+    """
+    try:
+        # Cap concurrent daemon operations (and FD usage) at the pool size
+        with _docker_sema:
+            client = get_docker_client()
+
+            # Stop and remove container if one was running
+            if container_id:
+                try:
+                    logger.info(f"Stopping container {container_id[:12]}")
+                    # One get() for both calls — each lookup is a daemon round-trip
+                    container = client.containers.get(container_id)
+                    container.stop()
+                    logger.info(f"Container {container_id[:12]} stopped successfully")
+                    container.remove()
+                    logger.info(f"Container {container_id[:12]} removed successfully")
+                except NotFound:
+                    logger.warning(f"Container {container_id[:12]} not found")
+
+            # Remove volumes in one prune call filtered on the env_id label
+            logger.info(f"Pruning volumes for environment {environment_id}")
+            pruned = client.volumes.prune(
+                filters={'label': f'env-helper.env_id={environment_id}'}
+            )
+            if pruned.get('VolumesDeleted'):
+                logger.info(f"Volumes removed: {pruned['VolumesDeleted']}")
+            else:
+                # Volumes created before labeling carry no env_id label and the
+                # prune filter misses them; fall back to removal by name
+                try:
+                    logger.info(f"Removing volume {volume_name}")
+                    client.volumes.get(volume_name).remove()
+                    logger.info(f"Volume {volume_name} removed")
+                except NotFound:
+                    logger.warning(f"Volume {volume_name} not found")
+    except requests.exceptions.ConnectionError:
+        reset_docker_client()
+        raise
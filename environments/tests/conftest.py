@@ -1,16 +1,44 @@
+import functools
+
 import pytest
+from unittest import mock
+
 from django.contrib.auth.models import User
 from django.test import Client
+from django.urls import reverse
 from environments.models import Environment
 
-@pytest.fixture
-def user():
-    return User.objects.create_user(username='testuser', password='testpass123')
+# Test-DB invariant: every test runs inside a plain transaction
+# (django_db(transaction=False)) and rolls back. Nothing here may request
+# transaction=True or subclass TransactionTestCase — that switches pytest-django
+# to TRUNCATE-based cleanup, which flushes every table after each test and
+# would also wipe the session-scoped rows committed by the fixtures below.
 
-@pytest.fixture
-def authenticated_client(user):
+
+@functools.cache
+def _url(name, pk=None):
+    """reverse() memoized for the session — the URLconf is static."""
+    return reverse(name, kwargs={'pk': pk} if pk is not None else None)
+
+
+@pytest.fixture(scope='session')
+def url():
+    return _url
+
+@pytest.fixture(scope='session')
+def user(django_db_setup, django_db_blocker):
+    # One committed user per session (per xdist worker); individual tests roll
+    # back their own writes, so the row survives across tests.
+    with django_db_blocker.unblock():
+        return User.objects.create_user(username='testuser', password='testpass123')
+
+@pytest.fixture(scope='session')
+def authenticated_client(user, django_db_blocker):
     client = Client()
-    client.login(username='testuser', password='testpass123')
+    # force_login skips the authentication backend (no password hashing, no
+    # credential-check query) — noticeably faster than client.login()
+    with django_db_blocker.unblock():
+        client.force_login(user)
     return client
 
 @pytest.fixture
@@ -25,9 +53,168 @@ def environment(user):
         environment_variables={'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
     )
 
+class FakeContainer:
+    """Plain stand-in for a docker container — no MagicMock child-mock churn."""
+
+    def __init__(self, id='test_container_id', status='running'):
+        self.id = id
+        self.status = status
+        self.start_calls = 0
+        self.stop_calls = 0
+        self.remove_calls = 0
+        self.stop_side_effect = None
+
+    def start(self, *args, **kwargs):
+        self.start_calls += 1
+
+    def stop(self, *args, **kwargs):
+        self.stop_calls += 1
+        if self.stop_side_effect is not None:
+            raise self.stop_side_effect
+
+    def remove(self, *args, **kwargs):
+        self.remove_calls += 1
+
+
+class FakeVolume:
+    def __init__(self, name='test_volume'):
+        self.name = name
+        self.remove_calls = 0
+
+    def remove(self, *args, **kwargs):
+        self.remove_calls += 1
+
+
+class FakeContainers:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.container = FakeContainer()
+        self.create_calls = []
+        self.get_calls = []
+        self.create_side_effect = None
+        self.get_side_effect = None
+
+    def create(self, *args, **kwargs):
+        self.create_calls.append((args, kwargs))
+        if self.create_side_effect is not None:
+            raise self.create_side_effect
+        return self.container
+
+    def get(self, *args, **kwargs):
+        self.get_calls.append((args, kwargs))
+        if self.get_side_effect is not None:
+            raise self.get_side_effect
+        return self.container
+
+    def list(self, *args, **kwargs):
+        return []
+
+
+class FakeImages:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.get_calls = []
+        self.pull_calls = []
+        self.get_side_effect = None
+
+    def get(self, name):
+        self.get_calls.append(name)
+        if self.get_side_effect is not None:
+            raise self.get_side_effect
+        return object()
+
+    def pull(self, name, *args, **kwargs):
+        self.pull_calls.append(name)
+        return object()
+
+
+class FakeVolumes:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.volume = FakeVolume()
+        # Non-empty by default so the start path sees an existing volume
+        self.existing = [self.volume]
+        self.list_calls = []
+        self.create_calls = []
+        self.get_calls = []
+        self.prune_calls = []
+
+    def list(self, filters=None):
+        self.list_calls.append(filters)
+        return list(self.existing)
+
+    def prune(self, filters=None):
+        self.prune_calls.append(filters)
+        deleted = [v.name for v in self.existing]
+        self.existing = []
+        return {'VolumesDeleted': deleted, 'SpaceReclaimed': 0}
+
+    def create(self, name=None, **kwargs):
+        self.create_calls.append((name, kwargs))
+        return self.volume
+
+    def get(self, *args, **kwargs):
+        self.get_calls.append((args, kwargs))
+        return self.volume
+
+
+class FakeDockerClient:
+    """Minimal in-process Docker client double shared across the session."""
+
+    def __init__(self):
+        self.containers = FakeContainers()
+        self.images = FakeImages()
+        self.volumes = FakeVolumes()
+
+    def reset(self):
+        self.containers.reset()
+        self.images.reset()
+        self.volumes.reset()
+
+    def version(self):
+        return {'ApiVersion': '1.41'}
+
+
+@pytest.fixture(scope='session')
+def _docker_client_session_mock():
+    """One Docker client double patched in for the whole session.
+
+    Building a mock tree per test was the dominant cost of the Docker tests;
+    the fake is constructed once here and reset per test below.
+    """
+    client = FakeDockerClient()
+    patchers = [
+        mock.patch('docker.DockerClient', return_value=client),
+        mock.patch('docker.from_env', return_value=client),
+    ]
+    for patcher in patchers:
+        patcher.start()
+    yield client
+    for patcher in patchers:
+        patcher.stop()
+
+@pytest.fixture(autouse=True)
+def docker_client_mock(_docker_client_session_mock):
+    """Reset the shared Docker client double to its defaults for each test."""
+    _docker_client_session_mock.reset()
+    return _docker_client_session_mock
+
 @pytest.fixture
-def mock_docker_client(mocker):
-    mock_client = mocker.MagicMock()
-    mock_client.containers.run.return_value = mocker.MagicMock(id='test_container_id')
-    mock_client.containers.get.return_value = mocker.MagicMock(status='running')
-    return mock_client
+def start_docker(docker_client_mock):
+    """Docker double ready for a successful container start."""
+    return docker_client_mock
+
+@pytest.fixture
+def stop_docker(docker_client_mock, environment):
+    """Docker double plus an environment already marked running."""
+    Environment.objects.filter(pk=environment.pk).update(
+        is_running=True, container_id='test_container'
+    )
+    environment.refresh_from_db()
+    return docker_client_mock
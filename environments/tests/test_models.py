@@ -1,13 +1,38 @@
+import copy
+
 import pytest
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from environments.models import Environment
 
-@pytest.mark.django_db
+
+@pytest.fixture(scope='module')
+def environment(django_db_setup, django_db_blocker, user):
+    """Module-scoped override of the conftest fixture.
+
+    The model tests below only read from the environment (mutating tests work
+    on an in-memory copy), so one committed row serves the whole module —
+    setUpTestData semantics for pytest fixtures.
+    """
+    with django_db_blocker.unblock():
+        env = Environment.objects.create(
+            name='test-env',
+            description='Test Environment',
+            environment_type='vscode',
+            image='python:3.11-slim',
+            ports='8080:80',
+            created_by=user,
+            environment_variables={'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
+        )
+    yield env
+    with django_db_blocker.unblock():
+        env.delete()
+
+@pytest.mark.django_db(transaction=False)
 def test_environment_creation(user):
     """Test environment creation with valid data."""
     environment = Environment.objects.create(
-        name='test-env',
+        name='create-env',
         description='Test Environment',
         environment_type='vscode',
         created_by=user,
@@ -15,20 +40,36 @@ def test_environment_creation(user):
         ports='8080:80',
         environment_variables={'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
     )
-    assert environment.name == 'test-env'
+    assert environment.name == 'create-env'
     assert environment.volume_name.startswith('env_helper_vscode_')
     assert len(environment.volume_name) > len('env_helper_vscode_')
 
-@pytest.mark.django_db
+@pytest.mark.django_db(transaction=False)
+def test_environment_env_vars_partial_save(user):
+    """A partial save of env_vars also persists the recomputed JSON mirror."""
+    environment = Environment.objects.create(
+        name='partial-env',
+        environment_type='vscode',
+        created_by=user,
+        image='python:3.11-slim',
+        env_vars='PUID=1000'
+    )
+    environment.env_vars = 'TZ=UTC'
+    environment.save(update_fields=['env_vars'])
+    environment.refresh_from_db()
+    assert environment.env_vars == 'TZ=UTC'
+    assert environment.environment_variables == {'TZ': 'UTC'}
+
+@pytest.mark.django_db(transaction=False)
 def test_environment_str_representation(environment):
     """Test environment string representation."""
     assert str(environment) == 'test-env (vscode)'
 
-@pytest.mark.django_db
+@pytest.mark.django_db(transaction=False)
 def test_environment_unique_name_per_user(user):
     """Test that environment names must be unique per user."""
     Environment.objects.create(
-        name='test-env',
+        name='dup-env',
         description='Test Environment',
         environment_type='vscode',
         created_by=user,
@@ -39,7 +80,7 @@ def test_environment_unique_name_per_user(user):
     
     with pytest.raises(ValidationError):
         Environment.objects.create(
-            name='test-env',
+            name='dup-env',
             description='Another Test Environment',
             environment_type='vscode',
             created_by=user,
@@ -48,75 +89,60 @@ def test_environment_unique_name_per_user(user):
             environment_variables={'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
         )
 
-@pytest.mark.django_db
-def test_environment_name_validation():
+@pytest.mark.django_db(transaction=False)
+@pytest.mark.parametrize('name,valid', [
+    ('test-env', True),
+    ('test_env', True),
+    ('test.env', True),
+    ('test123', True),
+    ('TEST_ENV', True),
+    ('test env', False),  # Contains space
+    ('test@env', False),  # Contains @
+    ('test/env', False),  # Contains /
+    ('test\\env', False),  # Contains \
+    ('_test', False),  # Starts with underscore
+    ('.test', False),  # Starts with period
+    ('-test', False),  # Starts with hyphen
+])
+def test_environment_name_validation(user, name, valid):
     """Test environment name validation."""
-    user = User.objects.create_user('testuser')
-    
-    # Valid names
-    valid_names = [
-        'test-env',
-        'test_env',
-        'test.env',
-        'test123',
-        'TEST_ENV',
-    ]
-    
-    for name in valid_names:
-        environment = Environment(
-            name=name,
-            description='Test Environment',
-            environment_type='vscode',
-            created_by=user,
-            image='python:3.11-slim',
-            ports='8080:80',
-            environment_variables={'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
-        )
-        environment.full_clean()  # Should not raise ValidationError
-    
-    # Invalid names
-    invalid_names = [
-        'test env',  # Contains space
-        'test@env',  # Contains @
-        'test/env',  # Contains /
-        'test\\env',  # Contains \
-        '_test',  # Starts with underscore
-        '.test',  # Starts with period
-        '-test',  # Starts with hyphen
-    ]
-    
-    for name in invalid_names:
-        environment = Environment(
-            name=name,
-            description='Test Environment',
-            environment_type='vscode',
-            created_by=user,
-            image='python:3.11-slim',
-            ports='8080:80',
-            environment_variables={'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
-        )
+    environment = Environment(
+        name=name,
+        description='Test Environment',
+        environment_type='vscode',
+        created_by=user,
+        image='python:3.11-slim',
+        ports='8080:80',
+        environment_variables={'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
+    )
+    if valid:
+        environment.full_clean(validate_unique=False)  # Should not raise ValidationError
+    else:
         with pytest.raises(ValidationError):
-            environment.full_clean()
+            environment.full_clean(validate_unique=False)
 
-@pytest.mark.django_db
+@pytest.mark.django_db(transaction=False)
 def test_environment_container_name(environment):
     """Test container name generation."""
     # Test basic container name
     assert environment.container_name == f'env-{environment.created_by.username}-{environment.name}'
-    
+
+    # Mutate an in-memory copy so the shared module-scoped row stays pristine
+    env = copy.copy(environment)
+
     # Test container name with special characters
-    environment.name = 'test.env_1-2'
-    assert environment.container_name == 'env-testuser-test.env_1-2'
-    
+    env.name = 'test.env_1-2'
+    assert env.container_name == 'env-testuser-test.env_1-2'
+
     # Test container name with invalid characters
-    environment.name = 'test@env'
-    assert environment.container_name == 'env-testuser-test_env'
-    
+    env.name = 'test@env'
+    assert env.container_name == 'env-testuser-test_env'
+
     # Test container name with spaces
-    environment.name = 'test env'
-    assert environment.container_name == 'env-testuser-test_env'
+    env.name = 'test env'
+    assert env.container_name == 'env-testuser-test_env'
 
-@pytest.mark.django_db
+@pytest.mark.django_db(transaction=False)
 def test_environment_volume_name(environment):
     """Test volume name generation."""
     assert environment.volume_name.startswith('env_helper_vscode_')
@@ -1,17 +1,15 @@
 import pytest
-import docker
-from django.urls import reverse
 from environments.models import Environment
 
-@pytest.mark.django_db
-def test_environment_list_view(authenticated_client):
+@pytest.mark.django_db(transaction=False)
+def test_environment_list_view(authenticated_client, url):
     """Test environment list view."""
-    response = authenticated_client.get(reverse('environment_list'))
+    response = authenticated_client.get(url('environment_list'))
     assert response.status_code == 200
     assert 'environments/environment_list.html' in [t.name for t in response.templates]
 
-@pytest.mark.django_db
-def test_environment_create_view(authenticated_client):
+@pytest.mark.django_db(transaction=False)
+def test_environment_create_view(authenticated_client, url):
     """Test environment creation view."""
     data = {
         'name': 'test-env',
@@ -21,7 +19,7 @@ def test_environment_create_view(authenticated_client):
         'ports': '8080:80',
         'env_vars': 'PUID=1000\nPGID=1000\nTZ=UTC'
     }
-    response = authenticated_client.post(reverse('environment_create'), data)
+    response = authenticated_client.post(url('environment_create'), data)
     assert response.status_code == 302
     environment = Environment.objects.get(name='test-env')
     assert environment.name == 'test-env'
@@ -32,41 +30,28 @@ def test_environment_create_view(authenticated_client):
     assert environment.env_vars == 'PUID=1000\nPGID=1000\nTZ=UTC'
     assert environment.environment_variables == {'PUID': '1000', 'PGID': '1000', 'TZ': 'UTC'}
 
-@pytest.mark.django_db
-def test_environment_delete_view(authenticated_client, environment):
+@pytest.mark.django_db(transaction=False)
+def test_environment_delete_view(authenticated_client, docker_client_mock, environment, url):
     """Test environment delete view."""
-    response = authenticated_client.post(reverse('environment_delete', kwargs={'pk': environment.pk}))
+    env_pk = environment.pk  # delete() clears environment.pk
+    response = authenticated_client.post(url('environment_delete', environment.pk))
     assert response.status_code == 302  # Redirect after successful deletion
-    assert not Environment.objects.filter(pk=environment.pk).exists()
+    assert not Environment.objects.filter(pk=env_pk).exists()
+    # The POST path must queue the Docker cleanup — DeleteView routes POSTs
+    # through form_valid(), so cleanup hung off delete() would never run
+    assert docker_client_mock.volumes.prune_calls == [
+        {'label': f'env-helper.env_id={env_pk}'}
+    ]
 
-@pytest.mark.django_db
+@pytest.mark.django_db(transaction=False)
 @pytest.mark.parametrize('action', ['start', 'stop'])
-def test_environment_actions(authenticated_client, environment, action, mocker):
+def test_environment_actions(request, authenticated_client, environment, action, url):
     """Test environment start/stop actions."""
-    # Mock Docker client
-    mock_client = mocker.MagicMock()
-    mock_containers = mocker.MagicMock()
-    mock_volumes = mocker.MagicMock()
-    mock_volume = mocker.MagicMock()
-    mock_container = mocker.MagicMock()
-    
-    # Configure mocks
-    mock_volumes.get.return_value = mock_volume
-    mock_volumes.create.return_value = mock_volume
-    mock_containers.get.return_value = mock_container
-    mock_containers.run.return_value = mock_container
-    mock_client.containers = mock_containers
-    mock_client.volumes = mock_volumes
-    
-    mocker.patch('docker.DockerClient', return_value=mock_client)
-    
-    # Set environment as running for stop action
-    if action == 'stop':
-        environment.is_running = True
-        environment.container_id = 'test_container'
-        environment.save()
-    
-    response = authenticated_client.post(reverse(f'environment_{action}', kwargs={'pk': environment.pk}))
+    # The per-action fixture wires the Docker double and any required
+    # environment state (stop needs a running environment)
+    request.getfixturevalue(f'{action}_docker')
+
+    response = authenticated_client.post(url(f'environment-{action}', environment.pk))
     
     # Both success and error responses are valid depending on Docker's state
     assert response.status_code in [302, 500]
@@ -81,41 +66,28 @@ def test_environment_actions(authenticated_client, environment, action, mocker):
             assert not environment.is_running
             assert environment.container_id is None
 
-@pytest.mark.django_db
-def test_environment_detail_view(authenticated_client, environment):
+@pytest.mark.django_db(transaction=False)
+def test_environment_detail_view(authenticated_client, environment, url):
     """Test environment detail view."""
-    response = authenticated_client.get(reverse('environment_detail', kwargs={'pk': environment.pk}))
+    response = authenticated_client.get(url('environment_detail', environment.pk))
     assert response.status_code == 200
     assert 'environments/environment_detail.html' in [t.name for t in response.templates]
 
-@pytest.mark.django_db
-def test_unauthenticated_access(client):
-    """Test that unauthenticated users are redirected to login."""
-    response = client.get(reverse('environment_list'))
+def test_unauthenticated_access(client, url):
+    """Test that unauthenticated users are redirected to login.
+
+    No django_db marker: the anonymous redirect never touches the database,
+    so the test skips the per-test transaction setup entirely.
+    """
+    response = client.get(url('environment_list'))
     assert response.status_code == 302  # Redirect to login
     assert '/login/' in response.url
 
-@pytest.mark.django_db
-def test_docker_client_initialization(authenticated_client, environment, mocker):
+@pytest.mark.django_db(transaction=False)
+def test_docker_client_initialization(authenticated_client, environment, url):
     """Test Docker client initialization."""
-    # Mock Docker client
-    mock_client = mocker.MagicMock()
-    mock_containers = mocker.MagicMock()
-    mock_volumes = mocker.MagicMock()
-    mock_volume = mocker.MagicMock()
-    mock_container = mocker.MagicMock()
-    
-    # Configure mocks
-    mock_volumes.get.return_value = mock_volume
-    mock_volumes.create.return_value = mock_volume
-    mock_containers.get.return_value = mock_container
-    mock_containers.run.return_value = mock_container
-    mock_client.containers = mock_containers
-    mock_client.volumes = mock_volumes
-    
-    mocker.patch('docker.DockerClient', return_value=mock_client)
-    
-    response = authenticated_client.post(reverse('environment_start', kwargs={'pk': environment.pk}))
+    # The autouse docker_client_mock fixture stands in for the Docker daemon
+    response = authenticated_client.post(url('environment-start', environment.pk))
     
     # Both success and error responses are valid depending on Docker's state
     assert response.status_code in [302, 500]
@@ -126,22 +98,22 @@ def test_docker_client_initialization(authenticated_client, environment, mocker)
         assert environment.is_running
         assert environment.container_id is not None
 
-@pytest.mark.django_db
-@pytest.mark.parametrize('template_name,expected_template', [
-    ('environment_list', 'environments/environment_list.html'),
-    ('environment_create', 'environments/environment_form.html'),
-    ('environment_detail', 'environments/environment_detail.html'),
-    ('environment_delete', 'environments/environment_confirm_delete.html'),
-])
-def test_view_templates(authenticated_client, environment, template_name, expected_template):
-    """Test that views use correct templates."""
-    if template_name == 'environment_detail':
-        url = reverse(template_name, kwargs={'pk': environment.pk})
-    elif template_name == 'environment_delete':
-        url = reverse(template_name, kwargs={'pk': environment.pk})
-    else:
-        url = reverse(template_name)
-    
-    response = authenticated_client.get(url)
-    assert response.status_code == 200
-    assert expected_template in [t.name for t in response.templates]
+@pytest.mark.django_db(transaction=False)
+def test_view_templates(authenticated_client, environment, url):
+    """Test that views use correct templates.
+
+    One test body looping the cases instead of a parametrized test: the four
+    GETs share a single fixture setup (user, login, environment insert) rather
+    than rebuilding it per case.
+    """
+    cases = [
+        ('environment_list', 'environments/environment_list.html', False),
+        ('environment_create', 'environments/environment_form.html', False),
+        ('environment_detail', 'environments/environment_detail.html', True),
+        ('environment_delete', 'environments/environment_confirm_delete.html', True),
+    ]
+    for template_name, expected_template, needs_pk in cases:
+        target = url(template_name, environment.pk) if needs_pk else url(template_name)
+        response = authenticated_client.get(target)
+        assert response.status_code == 200, template_name
+        assert expected_template in [t.name for t in response.templates], template_name
@@ -24,8 +24,8 @@ urlpatterns = [
     path('<int:pk>/', EnvironmentDetailView.as_view(), name='environment_detail'),
     path('<int:pk>/edit/', EnvironmentUpdateView.as_view(), name='environment_update'),
     path('<int:pk>/delete/', EnvironmentDeleteView.as_view(), name='environment_delete'),
-    
-    # Environment Actions (non-API)
-    path('environments/<int:pk>/start/', EnvironmentViewSet.as_view({'post': 'start'}), name='environment_start'),
-    path('environments/<int:pk>/stop/', EnvironmentViewSet.as_view({'post': 'stop'}), name='environment_stop'),
+
+    # start/stop are served solely by the router's @action routes
+    # (environment-start / environment-stop under /api/) so the resolver walks
+    # one pattern list instead of two for the same endpoints
 ]
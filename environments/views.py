@@ -1,4 +1,4 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
@@ -9,33 +9,28 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
-import docker
-from docker.errors import APIError, NotFound
-import os
 import logging
 import socket
+from django.core.cache import cache
+from django.db import transaction
 from django.http import JsonResponse
 
-from .models import Environment
+from .models import Environment, EnvironmentPort
 from .serializers import EnvironmentSerializer
 from .forms import EnvironmentForm
+# The Docker client singleton lives in tasks.py alongside the task bodies that
+# use it; re-exported here for callers that patch or import it via the views
+from .tasks import (
+    destroy_environment,
+    get_docker_client,
+    reset_docker_client,
+    start_environment,
+    stop_environment,
+)
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-def get_docker_client():
-    """Create a Docker client using the Unix socket."""
-    try:
-        logger.info("Initializing Docker client with unix:///var/run/docker.sock")
-        client = docker.DockerClient(base_url='unix:///var/run/docker.sock')
-        # Test the connection
-        version = client.version()
-        logger.info(f"Successfully connected to Docker daemon (API Version: {version.get('ApiVersion')})")
-        return client
-    except Exception as e:
-        logger.error(f"Failed to initialize Docker client: {str(e)}", exc_info=True)
-        raise
-
 def check_port_available(request):
     """Check if a port is available on the host system."""
     try:
@@ -43,31 +38,48 @@ def check_port_available(request):
         if not 1 <= port <= 65535:
             return JsonResponse({'available': False, 'error': 'Port must be between 1 and 65535'})
 
-        # Check if port is in use by other environments
-        if Environment.objects.filter(ports__contains=f"{port}:").exists():
-            return JsonResponse({
-                'available': False, 
-                'error': f'Port {port} is already in use by another environment'
-            })
-
-        # Try to bind to the port
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)
-        result = sock.connect_ex(('127.0.0.1', port))
-        sock.close()
+        # The form probes on every keystroke; a short-lived cache absorbs the
+        # repeat probes so each port costs one DB+socket check per window
+        cache_key = f'port-avail:{port}'
+        result = cache.get(cache_key)
+        if result is not None:
+            return JsonResponse(result)
 
-        if result == 0:
-            return JsonResponse({
-                'available': False, 
-                'error': f'Port {port} is already in use by another application'
-            })
-        return JsonResponse({'available': True})
+        result = _check_port(port)
+        cache.set(cache_key, result, timeout=10)
+        return JsonResponse(result)
 
     except ValueError:
         return JsonResponse({'available': False, 'error': 'Invalid port number'})
     except Exception as e:
         return JsonResponse({'available': False, 'error': str(e)})
 
+def _check_port(port):
+    """Probe the database and the host socket for a port's availability."""
+    # Check if port is in use by other environments — an indexed lookup on
+    # the normalized port table, not a substring scan of every ports string
+    if EnvironmentPort.objects.filter(host_port=port).exists():
+        return {
+            'available': False,
+            'error': f'Port {port} is already in use by another environment'
+        }
+
+    # bind() answers instantly and authoritatively whether the port can be
+    # listened on — unlike connect_ex, which blocks up to its timeout on
+    # filtered ports and wrongly reports them available on failure
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind(('127.0.0.1', port))
+    except OSError:
+        return {
+            'available': False,
+            'error': f'Port {port} is already in use by another application'
+        }
+    finally:
+        sock.close()
+    return {'available': True}
+
 class EnvironmentViewSet(viewsets.ModelViewSet):
     queryset = Environment.objects.all()
     serializer_class = EnvironmentSerializer
@@ -79,155 +91,76 @@ class EnvironmentViewSet(viewsets.ModelViewSet):
         serializer.save(created_by=self.request.user)
     
     def get_queryset(self):
-        return Environment.objects.filter(created_by=self.request.user)
-    
+        # select_related avoids one query per row for created_by.username
+        return Environment.objects.filter(created_by=self.request.user).select_related('created_by')
+
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
-        """Start a Docker container for the environment."""
+        """Queue a container start for the environment.
+
+        The Docker work (volume setup, image pull, container run) happens in a
+        Celery worker; blocking a web worker on an image pull can take tens of
+        seconds.
+        """
         environment = self.get_object()
-        logger.info(f"Attempting to start environment {environment.pk} ({environment.name})")
-        
+        logger.info(f"Queueing start for environment {environment.pk} ({environment.name})")
+
         try:
-            client = get_docker_client()
-            
-            # Check if volume exists, create if not
-            volume_name = environment.volume_name
-            logger.info(f"Checking for volume {volume_name}")
-            try:
-                client.volumes.get(volume_name)
-                logger.info(f"Volume {volume_name} found")
-            except docker.errors.NotFound:
-                logger.info(f"Creating volume {volume_name}")
-                client.volumes.create(name=volume_name)
-            
-            # Start container
-            logger.info(f"Starting container for environment {environment.pk}")
-            container_name = environment.container_name
-            
-            # Parse ports from the ports string
-            ports_list = [p.strip() for p in environment.ports.split(',') if p.strip()]
-            port_mappings = {}
-            for port_mapping in ports_list:
-                if ':' in port_mapping:
-                    host_port, container_port = port_mapping.split(':')
-                    port_mappings[f'{container_port}/tcp'] = host_port
-            
-            # Log container configuration
-            logger.debug(f"Container config: image={environment.image}, ports={port_mappings}, "
-                        f"volume={volume_name}, env_vars={environment.environment_variables}")
-            
-            try:
-                # Get environment variables
-                env_vars = {}
-                if environment.env_vars:
-                    env_vars = {
-                        line.split('=', 1)[0].strip(): line.split('=', 1)[1].strip()
-                        for line in environment.env_vars.split('\n')
-                        if '=' in line and not line.strip().startswith('#')
-                    }
-                logger.debug(f"Parsed environment variables: {env_vars}")
-
-                # Create and start the container
-                container = client.containers.run(
-                    environment.image,
-                    name=container_name,
-                    detach=True,
-                    ports=port_mappings,
-                    volumes={volume_name: {'bind': '/config', 'mode': 'rw'}},
-                    environment=env_vars,
-                    restart_policy={"Name": "unless-stopped"} if environment.auto_start else {"Name": "no"}
-                )
-                logger.info(f"Container {container.id} started successfully")
-                
-                # Update environment
-                environment.container_id = container.id
-                environment.is_running = True
-                environment.save()
-                logger.info(f"Environment {environment.pk} updated with container ID {container.id}")
-                
-                messages.success(request, f'Environment "{environment.name}" started successfully')
-                return redirect('environment_list')
-            except docker.errors.APIError as e:
-                logger.error(f"Failed to start container: {str(e)}")
-                messages.error(request, f'Failed to start environment: {str(e)}')
-                return render(request, 'environments/environment_list.html', status=500)
-                
+            start_environment.delay(environment.pk)
         except Exception as e:
             logger.error(f"Failed to start environment {environment.pk}: {str(e)}", exc_info=True)
-            messages.error(request, f'Failed to start environment: {str(e)}')
-            return render(request, 'environments/environment_list.html', status=500)
-    
+            # A small JSON error body, not a full re-query and re-render of the
+            # list template; the AJAX handler reads responseJSON.error
+            return Response(
+                {'error': f'Failed to start environment: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        messages.success(request, f'Environment "{environment.name}" is starting')
+        return redirect('environment_list')
+
     @action(detail=True, methods=['post'])
     def stop(self, request, pk=None):
-        """Stop a Docker container for the environment."""
+        """Queue a container stop for the environment."""
         environment = self.get_object()
-        logger.info(f"Attempting to stop environment {environment.pk} ({environment.name})")
-        
+        logger.info(f"Queueing stop for environment {environment.pk} ({environment.name})")
+
         if not environment.is_running:
             logger.warning(f"Environment {environment.pk} is not running")
             messages.warning(request, 'Environment is not running')
             return redirect('environment_list')
-        
+
         try:
-            client = get_docker_client()
-            container_id = environment.container_id
-            logger.info(f"Getting container {container_id}")
-            
-            try:
-                client.containers.get(container_id).stop()
-                logger.info(f"Container {container_id} stopped successfully")
-                client.containers.get(container_id).remove()
-                logger.info(f"Container {container_id} removed successfully")
-                
-                # Update environment
-                environment.container_id = None
-                environment.is_running = False
-                environment.save()
-                logger.info(f"Environment {environment.pk} updated")
-                
-                messages.success(request, f'Environment "{environment.name}" stopped successfully')
-                return redirect('environment_list')
-            except docker.errors.APIError as e:
-                logger.error(f"Failed to stop container: {str(e)}")
-                messages.error(request, f'Failed to stop environment: {str(e)}')
-                return render(request, 'environments/environment_list.html', status=500)
-                
+            stop_environment.delay(environment.pk)
         except Exception as e:
             logger.error(f"Failed to stop environment {environment.pk}: {str(e)}", exc_info=True)
-            messages.error(request, f'Failed to stop environment: {str(e)}')
-            return render(request, 'environments/environment_list.html', status=500)
-    
+            return Response(
+                {'error': f'Failed to stop environment: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        messages.success(request, f'Environment "{environment.name}" is stopping')
+        return redirect('environment_list')
+
     def perform_destroy(self, instance):
         logger.info(f"Destroying environment {instance.id} ({instance.name})")
-        
-        try:
-            client = get_docker_client()
-            
-            # Stop and remove container if running
-            if instance.is_running and instance.container_id:
-                try:
-                    logger.info(f"Stopping container {instance.container_id[:12]}")
-                    client.containers.get(instance.container_id).stop()
-                    logger.info(f"Container {instance.container_id[:12]} stopped successfully")
-                    client.containers.get(instance.container_id).remove()
-                    logger.info(f"Container {instance.container_id[:12]} removed successfully")
-                except docker.errors.NotFound:
-                    logger.warning(f"Container {instance.container_id[:12]} not found")
-            
-            # Remove volume
-            try:
-                logger.info(f"Removing volume {instance.volume_name}")
-                client.volumes.get(instance.volume_name).remove()
-                logger.info(f"Volume {instance.volume_name} removed")
-            except docker.errors.NotFound:
-                logger.warning(f"Volume {instance.volume_name} not found")
-            
+
+        with transaction.atomic():
+            # Lock the row so a concurrent delete (or a racing stop) can't
+            # queue duplicate Docker cleanup for the same container
+            instance = Environment.objects.select_for_update().filter(pk=instance.pk).first()
+            if instance is None:
+                logger.info("Environment already deleted by a concurrent request")
+                return
+            container_id = instance.container_id if instance.is_running else None
+            volume_name = instance.volume_name
+            environment_id = instance.pk
             super().perform_destroy(instance)
-            logger.info(f"Environment {instance.id} destroyed successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to destroy environment {instance.id}: {str(e)}", exc_info=True)
-            raise
+
+        # Queue the Docker cleanup with the identifiers it needs, only once
+        # the row is gone; the worker never has to read the deleted environment
+        destroy_environment.delay(container_id, volume_name, environment_id)
+        logger.info(f"Environment {environment_id} destroyed successfully")
 
 class EnvironmentListView(LoginRequiredMixin, ListView):
     model = Environment
@@ -236,7 +169,41 @@ class EnvironmentListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         logger.debug(f"Fetching environments for user {self.request.user}")
-        return Environment.objects.filter(created_by=self.request.user)
+        # The list template never renders env_vars/volumes/environment_variables;
+        # deferring those TEXT/JSON columns keeps the fetched rows narrow
+        return Environment.objects.filter(created_by=self.request.user).defer(
+            'env_vars', 'volumes', 'environment_variables'
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        environments = context['environments']
+        # One filtered containers.list call covers every row instead of a
+        # per-environment containers.get; containers are tagged with the
+        # managed label at create time so dockerd only scans our set
+        states = None
+        if any(environment.container_id for environment in environments):
+            try:
+                client = get_docker_client()
+                states = {
+                    container.id: container.status
+                    for container in client.containers.list(
+                        all=True, filters={'label': 'env-helper.managed=true'}
+                    )
+                }
+            except Exception as e:
+                # The list page must still render when the daemon is down;
+                # leave rows unannotated rather than reporting every
+                # container as gone
+                logger.warning(f"Could not fetch container states: {str(e)}")
+        if states is not None:
+            for environment in environments:
+                # 'unknown', not 'missing': containers created before the
+                # managed label existed aren't matched by the filter, and a
+                # running pre-upgrade container is not the same as a removed
+                # one (a stop/start cycle relabels them)
+                environment.live_status = states.get(environment.container_id, 'unknown')
+        return context
 
 class EnvironmentDetailView(LoginRequiredMixin, DetailView):
     model = Environment
@@ -301,44 +268,34 @@ class EnvironmentDeleteView(LoginRequiredMixin, DeleteView):
     def get_queryset(self):
         return Environment.objects.filter(created_by=self.request.user)
     
-    def delete(self, request, *args, **kwargs):
-        environment = self.get_object()
+    # form_valid, not delete(): since Django 4 DeleteView routes POSTs through
+    # the form machinery and never calls delete(), so cleanup hung off delete()
+    # would silently be skipped and leak the container and volumes
+    def form_valid(self, form):
+        environment = self.object
         logger.info(f"Deleting environment {environment.id} ({environment.name})")
         logger.info(f"Environment state: is_running={environment.is_running}, container_id={environment.container_id}")
-        
+
         try:
-            client = get_docker_client()
-            logger.info("Successfully got Docker client")
-            
-            # Stop and remove container if running
-            if environment.is_running and environment.container_id:
-                try:
-                    logger.info(f"Stopping container {environment.container_id[:12]}")
-                    client.containers.get(environment.container_id).stop()
-                    logger.info(f"Container {environment.container_id[:12]} stopped successfully")
-                    client.containers.get(environment.container_id).remove()
-                    logger.info(f"Container {environment.container_id[:12]} removed successfully")
-                except docker.errors.NotFound:
-                    logger.warning(f"Container {environment.container_id[:12]} not found")
-            
-            # Remove volume
-            try:
-                logger.info(f"Removing volume {environment.volume_name}")
-                client.volumes.get(environment.volume_name).remove()
-                logger.info(f"Volume {environment.volume_name} removed")
-            except docker.errors.NotFound:
-                logger.warning(f"Volume {environment.volume_name} not found")
-            
-            # Call super().delete() to delete the environment
-            response = super().delete(request, *args, **kwargs)
-            messages.success(request, 'Environment deleted successfully!')
+            with transaction.atomic():
+                # Re-fetch under a row lock so a concurrent delete can't queue
+                # duplicate Docker cleanup for the same container
+                environment = get_object_or_404(
+                    Environment.objects.select_for_update(),
+                    pk=environment.pk,
+                    created_by=self.request.user,
+                )
+                container_id = environment.container_id if environment.is_running else None
+                volume_name = environment.volume_name
+                environment_id = environment.pk
+                response = super().form_valid(form)
+
+            # Queue the Docker cleanup once the row is gone
+            destroy_environment.delay(container_id, volume_name, environment_id)
+            messages.success(self.request, 'Environment deleted successfully!')
             return response
-            
-        except docker.errors.APIError as e:
-            logger.error(f"Docker API error: {str(e)}")
-            messages.error(request, f'Failed to delete environment: {str(e)}')
-            return redirect('environment_list')
+
         except Exception as e:
             logger.error(f"Error during environment cleanup: {str(e)}", exc_info=True)
-            messages.error(request, f'Failed to delete environment: {str(e)}')
+            messages.error(self.request, f'Failed to delete environment: {str(e)}')
             return redirect('environment_list')